@@ -1,47 +1,99 @@
 #!/usr/bin/env python3
 
 import argparse
+import fnmatch
+import functools
+import heapq
 import subprocess
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional, Dict, Tuple
 import json
 import os
 
+# 作业名数量超过该阈值时启用分块并行匹配
+_PARALLEL_THRESHOLD = 16384
+# 打印作业清单时最多显示的条目数，其余折叠为一行汇总
+_PREVIEW_LIMIT = 20
+
+try:
+    from .squeue_cache import squeue_cache
+except ImportError:
+    from squeue_cache import squeue_cache
+
 def get_running_jobs(user: Optional[str] = None) -> List[Tuple[str, str, str]]:
     """获取正在运行的作业信息列表，返回 (job_id, slurm_id, name) 元组列表"""
     try:
-        cmd = ["squeue"]
-        if user:
-            cmd.extend(["-u", user])
-        # 获取作业ID、名称和状态
-        cmd.extend(["-h", "-o", "%i|%j|%t"])
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        # 通过共享TTL缓存查询，避免短时间内重复执行squeue
         jobs = []
-        for line in result.stdout.strip().split('\n'):
-            if line:
-                slurm_id, name, status = line.split('|')
-                if status in ['R', 'PD']:  # 只处理正在运行或等待的作业
-                    jobs.append((name, slurm_id, status))
+        for slurm_id, name, status, _partition in squeue_cache.get(user):
+            if status in ['R', 'PD']:  # 只处理正在运行或等待的作业
+                jobs.append((name, slurm_id, status))
         return jobs
     except subprocess.CalledProcessError as e:
         print(f"获取作业列表失败: {e}")
         return []
 
+@functools.lru_cache(maxsize=256)
+def _compile_globs(patterns: Tuple[str, ...]) -> "re.Pattern":
+    """将多个通配符模式合并为一个交替正则并缓存，每个作业名只需匹配一次"""
+    alternation = '|'.join(fnmatch.translate(p) for p in patterns)
+    return re.compile(alternation)
+
+class PatternMatcher:
+    """按模式结构分派的多模式匹配器
+
+    纯字面模式归入集合做哈希探测；`前缀*`形式的模式合并成一个
+    前缀元组，由str.startswith一次性判断（内部即共享前缀遍历）；
+    其余通配模式合并为单个交替正则。模式越多收益越明显。
+    """
+
+    def __init__(self, patterns: List[str]):
+        literals = set()
+        prefixes = []
+        general = []
+        for pattern in patterns:
+            if not any(c in pattern for c in '*?['):
+                literals.add(pattern)
+            elif pattern.endswith('*') and not any(c in pattern[:-1] for c in '*?['):
+                prefixes.append(pattern[:-1])
+            else:
+                general.append(pattern)
+        self._literals = literals
+        self._prefixes = tuple(prefixes)
+        self._general = _compile_globs(tuple(sorted(general))) if general else None
+
+    def match(self, name: str) -> bool:
+        """判断作业名是否匹配任意一个模式"""
+        if name in self._literals:
+            return True
+        if self._prefixes and name.startswith(self._prefixes):
+            return True
+        return self._general is not None and self._general.match(name) is not None
+
+    def filter(self, names: List[str]) -> List[str]:
+        """批量筛选匹配的作业名，超大输入时按块并行匹配"""
+        if len(names) <= _PARALLEL_THRESHOLD:
+            return [name for name in names if self.match(name)]
+
+        workers = max(2, (os.cpu_count() or 2) // 2)
+        chunk_size = (len(names) + workers - 1) // workers
+        chunks = [names[i:i + chunk_size] for i in range(0, len(names), chunk_size)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(
+                lambda chunk: [name for name in chunk if self.match(name)],
+                chunks
+            )
+        return [name for matched in results for name in matched]
+
 def match_job_pattern(pattern: str, job_names: List[str]) -> List[str]:
     """匹配作业名称模式，支持通配符匹配"""
-    # 将通配符模式转换为正则表达式
-    if '*' in pattern:
-        # 转义所有特殊字符，但保留 *
-        regex_pattern = re.escape(pattern).replace('\\*', '.*')
-    else:
-        regex_pattern = re.escape(pattern)
-    
-    # 编译正则表达式
-    regex = re.compile(f"^{regex_pattern}$")
-    
-    # 返回所有匹配的作业名称
-    return [name for name in job_names if regex.match(name)]
+    # 纯字面模式（无任何通配符）直接做相等比较，完全绕开模式匹配
+    if not any(c in pattern for c in '*?['):
+        return [name for name in job_names if name == pattern]
+
+    # fnmatch.filter在C层完成匹配，并在内部缓存已翻译的模式
+    return fnmatch.filter(job_names, pattern)
 
 def cancel_jobs_by_patterns(patterns: List[str], user: Optional[str] = None) -> bool:
     """通过作业名称模式取消作业"""
@@ -55,27 +107,37 @@ def cancel_jobs_by_patterns(patterns: List[str], user: Optional[str] = None) ->
         print("没有找到正在运行的作业")
         return True
 
-    # 对每个模式进行匹配
-    jobs_to_cancel = set()
-    for pattern in patterns:
-        job_names = [job[0] for job in running_jobs]  # 获取所有作业名称
-        matched_names = match_job_pattern(pattern, job_names)
-        
-        # 找到匹配名称对应的Slurm ID
-        for name in matched_names:
-            for job_name, slurm_id, status in running_jobs:
-                if job_name == name:
-                    jobs_to_cancel.add((job_name, slurm_id, status))
+    # 按模式结构分派匹配，每个作业名最多三次C层判断
+    matcher = PatternMatcher(patterns)
+    if len(running_jobs) <= _PARALLEL_THRESHOLD:
+        # 常规规模：单趟遍历，不物化中间的作业名列表
+        jobs_to_cancel = {
+            (job_name, slurm_id, status)
+            for job_name, slurm_id, status in running_jobs
+            if matcher.match(job_name)
+        }
+    else:
+        # 超大队列：交给filter分块并行匹配
+        matched_names = set(matcher.filter([job[0] for job in running_jobs]))
+        jobs_to_cancel = {
+            (job_name, slurm_id, status)
+            for job_name, slurm_id, status in running_jobs
+            if job_name in matched_names
+        }
 
     if not jobs_to_cancel:
         print(f"没有找到匹配的作业")
         return True
 
-    # 显示找到的作业
+    # 显示找到的作业（有界预览：只对前若干条排序，批量取消上千作业时
+    # 不做O(M log M)全量排序和超长字符串拼接）
     print("\n找到以下匹配的作业:")
-    for job_name, slurm_id, status in sorted(jobs_to_cancel):
+    preview = heapq.nsmallest(_PREVIEW_LIMIT, jobs_to_cancel)
+    for job_name, slurm_id, status in preview:
         status_str = "运行中" if status == 'R' else "等待中"
         print(f"  - {job_name} (Slurm ID: {slurm_id}, 状态: {status_str})")
+    if len(jobs_to_cancel) > len(preview):
+        print(f"  ... 另有 {len(jobs_to_cancel) - len(preview)} 个作业")
 
     # 确认取消
     try:
@@ -83,9 +145,12 @@ def cancel_jobs_by_patterns(patterns: List[str], user: Optional[str] = None) ->
         slurm_ids = [job[1] for job in jobs_to_cancel]
         cmd = ["scancel"] + slurm_ids
         subprocess.run(cmd, check=True)
+        squeue_cache.invalidate()  # 作业状态已变化，强制下次查询刷新
         print(f"\n成功取消以下作业:")
-        for job_name, slurm_id, _ in sorted(jobs_to_cancel):
+        for job_name, slurm_id, _ in preview:
             print(f"  - {job_name} (Slurm ID: {slurm_id})")
+        if len(jobs_to_cancel) > len(preview):
+            print(f"  ... 另有 {len(jobs_to_cancel) - len(preview)} 个作业")
         return True
     except subprocess.CalledProcessError as e:
         print(f"\n取消作业失败: {e}")
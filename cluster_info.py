@@ -1,75 +1,169 @@
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple
 import re
 from datetime import datetime
 import json
 
+# 预编译sinfo输出行的正则（对应 -o '%P %a %l %D %T %N %C %m' 格式）
+# 分组依次为：分区、CPU数、状态、节点名、内存；bytes模式直接扫描未解码的输出
+_SINFO_LINE = re.compile(
+    br'^(\S+)\s+\S+\s+\S+\s+(\d+)\s+(\S+)\s+(\S+)\s+\S+\s+(\d+[MGT]?)',
+    re.MULTILINE
+)
+# 预编译内存字符串正则（单位可省略，默认为MB）
+_MEM_RE = re.compile(r'(\d+)([MGT]?)')
+# 内存单位到MB的换算表
+_MEM_MULT = {'': 1, 'M': 1, 'G': 1024, 'T': 1024 * 1024}
+# 预编译GPU数量正则（匹配gres字符串中的 gpu:N）
+_GPU_RE = re.compile(r'gpu:(\d+)')
+
 class ClusterInfo:
-    def __init__(self):
-        """初始化集群信息管理器"""
+    def __init__(self, background_refresh: bool = False):
+        """初始化集群信息管理器
+
+        Args:
+            background_refresh: 启用后台线程定期刷新缓存，
+                                调用方读取时不再触发同步刷新
+        """
         self.partitions = {}  # 分区信息缓存
         self.nodes = {}      # 节点信息缓存
         self.last_update = None  # 最后更新时间
         self.update_interval = 60  # 更新间隔（秒）
+        self._summary_cache = None  # 资源摘要缓存，随partitions一起刷新
+        self._json_cache = None  # to_json渲染结果缓存
 
-    def _parse_sinfo_output(self, output: str) -> Dict:
-        """解析sinfo命令输出"""
+        self._refresh_thread = None
+        if background_refresh:
+            # 首次刷新同步完成：否则从构造返回到后台线程第一次刷新
+            # 之间存在窗口，读侧全部命中空的partitions缓存
+            try:
+                self._refresh()
+            except Exception as e:
+                print(f"更新集群信息失败: {e}")
+            self._refresh_thread = threading.Thread(
+                target=self._refresh_loop, daemon=True)
+            self._refresh_thread.start()
+
+    @staticmethod
+    def _new_partition() -> Dict:
+        """创建空的分区信息结构
+
+        节点数据采用SoA布局（多个平行列表），比每节点一个小字典
+        更省内存也更利于批量遍历。
+        """
+        return {
+            'total_nodes': 0,
+            'available_nodes': 0,
+            'total_cpus': 0,
+            'available_cpus': 0,
+            'total_gpus': 0,
+            'available_gpus': 0,
+            'memory': 0,
+            'max_cpus_per_node': 0,
+            'max_gpus_per_node': 0,
+            'node_names': [],
+            'node_states': [],
+            'node_cpus': [],
+            'node_memory': [],
+            'node_gpus': []
+        }
+
+    @staticmethod
+    def _add_node(part: Dict, name: str, state: str, cpus: int, memory: int) -> None:
+        """向分区追加一个节点并同步更新聚合字段"""
+        part['node_names'].append(name)
+        part['node_states'].append(state)
+        part['node_cpus'].append(cpus)
+        part['node_memory'].append(memory)
+        part['node_gpus'].append(0)
+        part['total_nodes'] += 1
+        if 'alloc' not in state.lower():
+            part['available_nodes'] += 1
+        part['total_cpus'] += cpus
+        part['memory'] = max(part['memory'], memory)
+        part['max_cpus_per_node'] = max(part['max_cpus_per_node'], cpus)
+
+    def _parse_sinfo_output(self, output: bytes) -> Dict:
+        """解析sinfo命令输出（bytes），仅对匹配到的短字段做解码"""
         partitions = {}
-        lines = output.strip().split('\n')[1:]  # 跳过标题行
-        
-        for line in lines:
-            parts = line.split()
-            if len(parts) >= 8:
-                partition = parts[0]
-                if partition not in partitions:
-                    partitions[partition] = {
-                        'total_nodes': 0,
-                        'available_nodes': 0,
-                        'total_cpus': 0,
-                        'available_cpus': 0,
-                        'total_gpus': 0,
-                        'available_gpus': 0,
-                        'memory': 0,
-                        'nodes': []
-                    }
-                
-                node_info = {
-                    'name': parts[5],
-                    'state': parts[4],
-                    'cpus': int(parts[3]),
-                    'memory': self._parse_memory(parts[6])
-                }
-                
-                partitions[partition]['nodes'].append(node_info)
-                partitions[partition]['total_nodes'] += 1
-                if 'alloc' not in node_info['state'].lower():
-                    partitions[partition]['available_nodes'] += 1
-                partitions[partition]['total_cpus'] += node_info['cpus']
-                partitions[partition]['memory'] = max(partitions[partition]['memory'], node_info['memory'])
-        
+
+        # 预编译正则一次性扫描全部输出，标题行不含数字字段自然被跳过
+        for match in _SINFO_LINE.finditer(output):
+            partition, cpus, state, name, memory = (
+                g.decode() for g in match.groups()
+            )
+            if partition not in partitions:
+                partitions[partition] = self._new_partition()
+            self._add_node(partitions[partition], name, state,
+                           int(cpus), self._parse_memory(memory))
+
+        return partitions
+
+    def _parse_sinfo_json(self, data: Dict) -> Dict:
+        """解析sinfo --json输出，返回与文本解析相同结构的分区信息"""
+        partitions = {}
+
+        for entry in data.get('sinfo', []):
+            partition = entry.get('partition', {}).get('name')
+            if not partition:
+                continue
+            if partition not in partitions:
+                partitions[partition] = self._new_partition()
+
+            states = entry.get('node', {}).get('state', [])
+            state = ','.join(states) if isinstance(states, list) else str(states)
+            node_names = entry.get('nodes', {}).get('nodes', [])
+            total = entry.get('nodes', {}).get('total', len(node_names)) or len(node_names)
+            cpus_total = entry.get('cpus', {}).get('total', 0)
+            cpus_per_node = cpus_total // total if total else 0
+            memory = entry.get('memory', {}).get('maximum', 0)  # 已经是MB
+
+            for name in node_names:
+                self._add_node(partitions[partition], name, state,
+                               cpus_per_node, memory)
+
         return partitions
 
     def _parse_memory(self, mem_str: str) -> int:
-        """解析内存字符串（例如：32G）为MB"""
-        match = re.match(r'(\d+)([MGT])', mem_str)
+        """解析内存字符串（例如：32G）为MB，无单位时视为MB"""
+        match = _MEM_RE.match(mem_str)
         if not match:
             return 0
-        
+
         value, unit = match.groups()
-        value = int(value)
-        if unit == 'T':
-            return value * 1024 * 1024
-        elif unit == 'G':
-            return value * 1024
-        return value
+        return int(value) * _MEM_MULT[unit]
 
     def _get_gpu_info(self) -> Dict[str, Dict]:
         """获取GPU信息"""
+        # 优先使用JSON输出，避免逐行字符串解析
         try:
-            # 使用scontrol show node获取更详细的节点信息
-            result = subprocess.run(['scontrol', 'show', 'node'], 
+            result = subprocess.run(['scontrol', 'show', 'node', '--json'],
+                                 capture_output=True, text=True)
+            if result.returncode == 0:
+                data = json.loads(result.stdout)
+                nodes = {}
+                for node in data.get('nodes', []):
+                    name = node.get('name')
+                    if not name:
+                        continue
+                    info = {'name': name}
+                    gres = node.get('gres_total') or node.get('gres') or ''
+                    gpu_match = _GPU_RE.search(str(gres).lower())
+                    if gpu_match:
+                        info['gpus'] = int(gpu_match.group(1))
+                    nodes[name] = info
+                return nodes
+        except (subprocess.SubprocessError, json.JSONDecodeError, OSError):
+            pass
+
+        # 旧版本Slurm不支持--json，回退到文本解析
+        try:
+            result = subprocess.run(['scontrol', 'show', 'node'],
                                  capture_output=True, text=True, check=True)
-            
+
             nodes = {}
             current_node = None
             
@@ -83,7 +177,7 @@ class ClusterInfo:
                     gres_parts = line.split('Gres=')[1].split(',')
                     for part in gres_parts:
                         if 'gpu' in part.lower():
-                            gpu_match = re.search(r'gpu:(\d+)', part.lower())
+                            gpu_match = _GPU_RE.search(part.lower())
                             if gpu_match:
                                 current_node['gpus'] = int(gpu_match.group(1))
             
@@ -94,32 +188,78 @@ class ClusterInfo:
         except subprocess.CalledProcessError:
             return {}
 
+    def _fetch_partitions(self) -> Dict:
+        """执行sinfo并解析为分区信息"""
+        # 优先使用JSON输出获取分区和节点信息（json.loads可直接处理bytes）
+        result = subprocess.run(['sinfo', '--json'], capture_output=True)
+        if result.returncode == 0:
+            try:
+                partitions = self._parse_sinfo_json(json.loads(result.stdout))
+                # JSON schema随Slurm版本变化，字段对不上时解析结果为空；
+                # 空结果同样走文本回退，否则所有分区都会被判定为不存在
+                if partitions:
+                    return partitions
+            except (json.JSONDecodeError, TypeError):
+                pass
+
+        # 旧版本Slurm不支持--json或schema不兼容，回退到文本解析
+        result = subprocess.run(['sinfo', '-o', '%P %a %l %D %T %N %C %m'],
+                             capture_output=True, check=True)
+        return self._parse_sinfo_output(result.stdout)
+
+    def _refresh(self) -> None:
+        """立即刷新集群信息（不检查刷新间隔）"""
+        # sinfo与scontrol是两个独立的RPC，并行执行以减少刷新时延
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            partitions_future = pool.submit(self._fetch_partitions)
+            gpu_future = pool.submit(self._get_gpu_info)
+            partitions = partitions_future.result()
+            gpu_info = gpu_future.result()
+
+        # 更新GPU信息到分区信息中
+        for partition in partitions.values():
+            node_gpus = partition['node_gpus']
+            node_states = partition['node_states']
+            for i, name in enumerate(partition['node_names']):
+                if name in gpu_info:
+                    gpus = gpu_info[name].get('gpus', 0)
+                    node_gpus[i] = gpus
+                    partition['total_gpus'] += gpus
+                    partition['max_gpus_per_node'] = max(
+                        partition['max_gpus_per_node'], gpus)
+                    if 'alloc' not in node_states[i].lower():
+                        partition['available_gpus'] += gpus
+
+        # 在本地字典上构建完成后再原子地换入，读侧永远看到一致的数据
+        self.partitions = partitions
+        self._summary_cache = self._compute_summary()
+        self._json_cache = None
+        self.last_update = datetime.now()
+
+    def _refresh_loop(self) -> None:
+        """后台刷新线程主循环，读侧始终命中预热好的缓存
+
+        首次刷新已在构造时同步完成，循环从休眠一个周期开始。
+        """
+        while True:
+            time.sleep(self.update_interval)
+            try:
+                self._refresh()
+            except Exception as e:
+                print(f"更新集群信息失败: {e}")
+
     def update(self) -> None:
         """更新集群信息"""
+        if self._refresh_thread is not None:
+            return  # 后台线程负责刷新，调用方直接读取缓存
+
         now = datetime.now()
-        if (self.last_update and 
+        if (self.last_update and
             (now - self.last_update).total_seconds() < self.update_interval):
             return
-        
+
         try:
-            # 获取分区和节点信息
-            result = subprocess.run(['sinfo', '-o', '%P %a %l %D %T %N %C %m'],
-                                 capture_output=True, text=True, check=True)
-            self.partitions = self._parse_sinfo_output(result.stdout)
-            
-            # 获取GPU信息
-            gpu_info = self._get_gpu_info()
-            
-            # 更新GPU信息到分区信息中
-            for partition in self.partitions.values():
-                for node in partition['nodes']:
-                    if node['name'] in gpu_info:
-                        node['gpus'] = gpu_info[node['name']].get('gpus', 0)
-                        partition['total_gpus'] += node['gpus']
-                        if 'alloc' not in node['state'].lower():
-                            partition['available_gpus'] += node['gpus']
-            
-            self.last_update = now
+            self._refresh()
         except subprocess.CalledProcessError as e:
             print(f"更新集群信息失败: {e}")
 
@@ -136,6 +276,12 @@ class ClusterInfo:
     def get_resource_summary(self) -> Dict:
         """获取资源使用摘要"""
         self.update()
+        if self._summary_cache is None:
+            self._summary_cache = self._compute_summary()
+        return self._summary_cache
+
+    def _compute_summary(self) -> Dict:
+        """根据当前分区信息计算资源摘要，仅在update()刷新后调用"""
         summary = {
             'total_nodes': 0,
             'available_nodes': 0,
@@ -180,12 +326,12 @@ class ClusterInfo:
         if partition_info['available_nodes'] == 0:
             return False, f"分区 {partition} 没有可用节点"
         
-        if cpus > max(node['cpus'] for node in partition_info['nodes']):
+        # 每分区的最大值在update()时已算好，这里直接读取，避免逐节点扫描
+        if cpus > partition_info['max_cpus_per_node']:
             return False, f"没有节点有足够的CPU核心（需要 {cpus}）"
-        
+
         if gpus > 0:
-            max_gpus = max((node.get('gpus', 0) for node in partition_info['nodes']), default=0)
-            if gpus > max_gpus:
+            if gpus > partition_info['max_gpus_per_node']:
                 return False, f"没有节点有足够的GPU（需要 {gpus}）"
             if partition_info['available_gpus'] < gpus:
                 return False, f"没有足够的可用GPU（需要 {gpus}，可用 {partition_info['available_gpus']}）"
@@ -196,10 +342,12 @@ class ClusterInfo:
         return True, "资源可用"
 
     def to_json(self) -> str:
-        """将集群信息转换为JSON格式"""
+        """将集群信息转换为JSON格式（结果按更新周期缓存）"""
         self.update()
-        return json.dumps({
-            'partitions': self.partitions,
-            'summary': self.get_resource_summary(),
-            'last_update': self.last_update.isoformat() if self.last_update else None
-        }, ensure_ascii=False)
+        if self._json_cache is None:
+            self._json_cache = json.dumps({
+                'partitions': self.partitions,
+                'summary': self.get_resource_summary(),
+                'last_update': self.last_update.isoformat() if self.last_update else None
+            }, ensure_ascii=False)
+        return self._json_cache
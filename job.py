@@ -1,9 +1,35 @@
 from enum import Enum
+import functools
+import shutil
 import subprocess
 import time
-import os
 from typing import Optional, Dict, Any, List
 
+# Slurm命令绝对路径缓存，避免每次调用都做PATH查找
+_BIN_CACHE: Dict[str, str] = {}
+
+def _slurm_bin(name: str) -> str:
+    """解析并缓存Slurm命令的绝对路径，找不到时原样返回交由exec报错"""
+    path = _BIN_CACHE.get(name)
+    if path is None:
+        path = shutil.which(name) or name
+        _BIN_CACHE[name] = path
+    return path
+
+# conda根目录缓存：None表示尚未解析，''表示解析失败
+_CONDA_BASE: Optional[str] = None
+
+def _conda_base() -> str:
+    """在提交端解析并缓存conda根目录，避免每个作业启动时跑conda info"""
+    global _CONDA_BASE
+    if _CONDA_BASE is None:
+        try:
+            _CONDA_BASE = subprocess.check_output(
+                ["conda", "info", "--base"], text=True).strip()
+        except (subprocess.SubprocessError, OSError):
+            _CONDA_BASE = ''
+    return _CONDA_BASE
+
 class JobStatus(Enum):
     PENDING = "PENDING"
     RUNNING = "RUNNING"
@@ -11,6 +37,67 @@ class JobStatus(Enum):
     FAILED = "FAILED"
     CANCELLED = "CANCELLED"
 
+# squeue短状态码与sacct长状态到JobStatus的映射，
+# 模块级字典避免每次状态更新时逐个字符串比较
+_STATE_MAP = {
+    "R": JobStatus.RUNNING,
+    "PD": JobStatus.RUNNING,
+    "CG": JobStatus.RUNNING,
+    "S": JobStatus.RUNNING,
+    "RUNNING": JobStatus.RUNNING,
+    "PENDING": JobStatus.RUNNING,
+    "CD": JobStatus.COMPLETED,
+    "COMPLETED": JobStatus.COMPLETED,
+    "F": JobStatus.FAILED,
+    "TO": JobStatus.FAILED,
+    "OOM": JobStatus.FAILED,
+    "FAILED": JobStatus.FAILED,
+    "TIMEOUT": JobStatus.FAILED,
+    "OUT_OF_MEMORY": JobStatus.FAILED,
+    "PR": JobStatus.FAILED,
+    "PREEMPTED": JobStatus.FAILED,
+    "NF": JobStatus.FAILED,
+    "NODE_FAIL": JobStatus.FAILED,
+    "DL": JobStatus.FAILED,
+    "DEADLINE": JobStatus.FAILED,
+    "CA": JobStatus.CANCELLED,
+    "CANCELLED": JobStatus.CANCELLED,
+}
+
+# 作业脚本中的固定片段：字面文本在模块加载时已序列化为常量，
+# 每次提交只做一次format填充，而不是十几次独立的字符串拼装
+_SCRIPT_DIRECTIVES_TEMPLATE = (
+    "#SBATCH --partition={partition}           # Partition name\n"
+    "#SBATCH --ntasks=1                     # Run a single task\n"
+    "#SBATCH --cpus-per-task={num_cpus}             # Number of CPU cores per task\n"
+    "#SBATCH --mem={memory}                       # Total memory per node\n"
+    "#SBATCH --time={time_limit}                # Time limit hrs:min:sec\n"
+)
+_SCRIPT_DEBUG_TEMPLATE = (
+    "\n# Print some info for debugging\n"
+    "export SBATCH_PARTITION={partition}\n"
+    'echo "Running on host: $(hostname)"\n'
+    'echo "Time is: $(date)"\n'
+    'echo "Directory is: $(pwd)"\n\n'
+)
+
+@functools.lru_cache(maxsize=128)
+def _sbatch_prefix(partition: str, num_gpus: int,
+                   num_cpus: int, memory: str) -> tuple:
+    """按资源规格缓存sbatch命令的公共前缀
+
+    批量提交时大量任务共享同一套分区/GPU/CPU/内存规格，
+    前缀argv只需格式化一次。
+    """
+    return (
+        _slurm_bin("sbatch"),
+        "--parsable",
+        f"--partition={partition}",
+        f"--gres=gpu:{num_gpus}",
+        f"--cpus-per-task={num_cpus}",
+        f"--mem={memory}",
+    )
+
 class Job:
     def __init__(
         self,
@@ -76,185 +163,239 @@ class Job:
         self.status = JobStatus.PENDING
         self.start_time: Optional[float] = None
         self.end_time: Optional[float] = None
+        # slurmctld保留已结束作业记录的时长（MinJobAge，默认300秒），
+        # 在此时间内不值得为squeue的瞬时缺失去查询慢得多的slurmdbd
+        self._min_job_age: float = 300.0
+
+    def _create_job_script_content(self, array: Optional[str] = None,
+                                   args_file: Optional[str] = None) -> str:
+        """生成包含环境设置的作业脚本内容
+
+        Args:
+            array: 作业数组说明（例如"0-9%4"），设置后生成--array指令
+            args_file: 每行一个任务参数串的文件路径，数组任务通过
+                       $SLURM_ARRAY_TASK_ID取各自的参数行
+        """
+        # 以列表收集片段，最后一次join，避免O(n^2)的字符串拼接
+        parts = ["#!/bin/bash\n\n"]
 
-    def _create_job_script(self) -> str:
-        """创建包含环境设置的作业脚本"""
-        script_content = "#!/bin/bash\n\n"
-        
         # 添加SBATCH参数
-        script_content += f"#SBATCH --job-name={self.job_id}         # Job name\n"
-        
+        parts.append(f"#SBATCH --job-name={self.job_id}         # Job name\n")
+        if array:
+            parts.append(f"#SBATCH --array={array}              # Job array\n")
+
         # 设置日志输出
         if self.log_dir:
-            log_path = f"{self.log_dir}/%x.log"
-            script_content += f"#SBATCH --output={log_path}         # Standard output and error log\n"
-        
-        script_content += f"#SBATCH --partition={self.partition}           # Partition name\n"
-        script_content += "#SBATCH --ntasks=1                     # Run a single task\n"
-        script_content += f"#SBATCH --cpus-per-task={self.num_cpus}             # Number of CPU cores per task\n"
-        script_content += f"#SBATCH --mem={self.memory}                       # Total memory per node\n"
-        script_content += f"#SBATCH --time={self.time_limit}                # Time limit hrs:min:sec\n"
-        
+            log_path = f"{self.log_dir}/%x_%a.log" if array else f"{self.log_dir}/%x.log"
+            parts.append(f"#SBATCH --output={log_path}         # Standard output and error log\n")
+
+        parts.append(_SCRIPT_DIRECTIVES_TEMPLATE.format(
+            partition=self.partition, num_cpus=self.num_cpus,
+            memory=self.memory, time_limit=self.time_limit))
+
         if self.num_gpus > 0:
-            script_content += f"#SBATCH --gres=gpu:{self.num_gpus}\n"
-            
+            parts.append(f"#SBATCH --gres=gpu:{self.num_gpus}\n")
+
         if self.mail_type and self.mail_user:
-            script_content += f"#SBATCH --mail-type={self.mail_type}           # Mail events\n"
-            script_content += f"#SBATCH --mail-user={self.mail_user}  # Where to send mail\n"
-        
+            parts.append(f"#SBATCH --mail-type={self.mail_type}           # Mail events\n")
+            parts.append(f"#SBATCH --mail-user={self.mail_user}  # Where to send mail\n")
+
         # 添加额外的SBATCH参数
         for key, value in self.extra_sbatch_params.items():
-            script_content += f"#SBATCH --{key}={value}\n"
-        
-        script_content += "\n# Print some info for debugging\n"
-        script_content += f"export SBATCH_PARTITION={self.partition}\n"
-        script_content += 'echo "Running on host: $(hostname)"\n'
-        script_content += 'echo "Time is: $(date)"\n'
-        script_content += 'echo "Directory is: $(pwd)"\n\n'
-        
+            parts.append(f"#SBATCH --{key}={value}\n")
+
+        parts.append(_SCRIPT_DEBUG_TEMPLATE.format(partition=self.partition))
+
         # 如果指定了工作目录，添加cd命令
         if self.working_dir:
-            script_content += f"cd {self.working_dir}\n\n"
-        
+            parts.append(f"cd {self.working_dir}\n\n")
+
         # 如果指定了conda环境，添加conda激活命令
         if self.conda_env:
-            script_content += "# Load any required modules\n"
-            script_content += "source $(conda info --base)/etc/profile.d/conda.sh\n"
-            script_content += f"conda activate {self.conda_env}\n\n"
-        
+            parts.append("# Load any required modules\n")
+            conda_base = _conda_base()
+            if conda_base:
+                # 提交端已解析好的字面路径，作业启动时不再执行conda info
+                parts.append(f"source {conda_base}/etc/profile.d/conda.sh\n")
+            else:
+                # 提交端没有conda，留给计算节点运行时解析
+                parts.append("source $(conda info --base)/etc/profile.d/conda.sh\n")
+            parts.append(f"conda activate {self.conda_env}\n\n")
+
         # 构建命令
-        if "blender" in self.executor.lower():
+        if args_file:
+            # 数组模式：按$SLURM_ARRAY_TASK_ID从参数文件取本任务的参数行
+            parts.append(
+                f'ARGS=$(sed -n "$((SLURM_ARRAY_TASK_ID+1))p" {args_file})\n'
+            )
+            cmd = [self.executor] + self.executor_args + [self.script_path]
+            parts.append(" ".join(cmd) + f" {self.script_args_separator} $ARGS\n")
+        elif "blender" in self.executor.lower():
             # Blender特殊处理
             cmd = [self.executor]  # 使用完整的blender路径
-            
+
             # 添加--background参数（如果没有在executor_args中指定）
             if "--background" not in self.executor_args:
                 cmd.append("--background")
-            
+
             # 添加其他执行器参数
             cmd.extend(self.executor_args)
-            
-            # # 添加blend文件（如果有）
-            # blend_file = None
-            # for key, value in list(self.args.items()):
-            #     if key.startswith(("blend_file", "animation_blendfile")):
-            #         blend_file = value
-            #         del self.args[key]
-            #         break
-            
+
             # 添加Python脚本
             cmd.extend(["--python", self.script_path])
-            
+
             # 添加脚本参数分隔符
             cmd.append(self.script_args_separator)
-            
+
             # 添加其他参数（每个参数独立一行）
-            script_content += " \\\n".join([" ".join(cmd)] + [
+            parts.append(" \\\n".join([" ".join(cmd)] + [
                 f"--{key} '{value}' "
                 for key, value in self.args.items()
-            ]) + "\n"
+            ]) + "\n")
         else:
             # 其他执行器的默认处理方式
             cmd = [self.executor] + self.executor_args + [self.script_path]
             if self.args:
                 cmd.append(self.script_args_separator)
                 cmd.extend([f"--{k}={v}" for k, v in self.args.items()])
-            script_content += " ".join(cmd) + "\n"
-        
-        script_content += "# End of script\n"
-        
-        # 创建临时作业脚本
-        script_path = f"tmp/slurm_job_{self.job_id}.sh"
-        with open(script_path, "w") as f:
-            f.write(script_content)
-        # 设置执行权限
-        os.chmod(script_path, 0o755)
-        return script_path
-
-    def _build_sbatch_command(self, job_script_path: str) -> str:
-        """构建sbatch命令"""
-        cmd = [
-            "sbatch",
-            f"--partition={self.partition}",
-            f"--gres=gpu:{self.num_gpus}",
-            f"--cpus-per-task={self.num_cpus}",
-            f"--mem={self.memory}",
-            f"--job-name={self.job_id}",
-            job_script_path
-        ]
-        return " ".join(cmd)
+            parts.append(" ".join(cmd) + "\n")
+
+        parts.append("# End of script\n")
+
+        return "".join(parts)
+
+    def _build_sbatch_command(self) -> List[str]:
+        """构建sbatch命令（argv列表，脚本经stdin传入，不写临时文件）"""
+        # 资源规格相同的任务共享缓存好的前缀，只有--job-name逐任务构建
+        return [*_sbatch_prefix(self.partition, self.num_gpus,
+                                self.num_cpus, self.memory),
+                f"--job-name={self.job_id}"]
 
     def submit(self) -> bool:
         """提交任务到Slurm"""
         try:
-            # 创建作业脚本
-            job_script = self._create_job_script()
-            
-            # 构建并执行sbatch命令
-            cmd = self._build_sbatch_command(job_script)
+            # 生成脚本内容并通过stdin交给sbatch，省去临时文件的写入/授权/删除
+            script_content = self._create_job_script_content()
             result = subprocess.run(
-                cmd,
-                shell=True,
+                self._build_sbatch_command(),
+                input=script_content,
                 check=True,
                 capture_output=True,
                 text=True
             )
-            
-            # 从sbatch输出中提取Slurm作业ID
-            self.slurm_id = result.stdout.strip().split()[-1]
+
+            # --parsable输出为纯作业ID（可能带;cluster后缀）
+            self.slurm_id = result.stdout.strip().split(';')[0]
             self.status = JobStatus.RUNNING
             self.start_time = time.time()
-            
-            # 清理临时作业脚本
-            try:
-                os.remove(job_script)
-            except OSError:
-                pass  # 忽略清理错误
-                
             return True
-            
+
         except subprocess.CalledProcessError as e:
             print(f"提交作业失败: {e}")
             self.status = JobStatus.FAILED
             return False
 
-    def check_status(self) -> JobStatus:
-        """检查任务状态"""
+    def submit_and_wait(self) -> bool:
+        """提交任务并阻塞等待完成（sbatch --wait），返回任务是否成功
+
+        与submit+轮询相比，--wait复用slurmctld的RPC通道等待完成通知，
+        对短任务更轻量，也减少控制器负载。
+        """
+        try:
+            cmd = self._build_sbatch_command()
+            cmd.insert(1, "--wait")
+            self.status = JobStatus.RUNNING
+            self.start_time = time.time()
+
+            process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+            # 脚本经stdin传入；sbatch先打印作业ID，然后阻塞直到任务结束
+            process.stdin.write(self._create_job_script_content())
+            process.stdin.close()
+            first_line = process.stdout.readline()
+            if first_line.strip():
+                self.slurm_id = first_line.strip().split(';')[0]
+            returncode = process.wait()
+            self.end_time = time.time()
+
+            self.status = JobStatus.COMPLETED if returncode == 0 else JobStatus.FAILED
+            return returncode == 0
+
+        except (subprocess.SubprocessError, OSError) as e:
+            print(f"提交作业失败: {e}")
+            self.status = JobStatus.FAILED
+            self.end_time = time.time()
+            return False
+
+    def apply_slurm_state(self, state: Optional[str]) -> JobStatus:
+        """根据批量查询得到的Slurm状态码更新任务状态
+
+        Args:
+            state: squeue的短状态码（'R'、'PD'等）或sacct的长状态
+                   （'COMPLETED'、'FAILED'等），None表示队列和记账中都未找到
+        """
+        status = _STATE_MAP.get(state)
+        if status is None:
+            return self.status
+
+        self.status = status
+        if status != JobStatus.RUNNING and not self.end_time:
+            self.end_time = time.time()
+
+        return self.status
+
+    def check_status(self, cached_state: Optional[str] = None) -> JobStatus:
+        """检查任务状态
+
+        Args:
+            cached_state: 批量查询预取到的状态码，提供时直接套用，
+                          不再为本任务单独执行squeue/sacct
+        """
         if not self.slurm_id:
             return self.status
 
+        if cached_state is not None:
+            return self.apply_slurm_state(cached_state)
+
         try:
-            cmd = f"squeue -j {self.slurm_id} -h"
+            cmd = [_slurm_bin("squeue"), "-j", self.slurm_id, "-h"]
             result = subprocess.run(
                 cmd,
-                shell=True,
                 capture_output=True,
                 text=True
             )
-            
+
             if result.returncode == 0 and result.stdout.strip():
                 # 作业仍在运行
                 self.status = JobStatus.RUNNING
             else:
+                # squeue瞬时缺失不代表作业结束：MinJobAge窗口内先跳过
+                # sacct（它走slurmdbd，比控制器慢），下个周期再看squeue
+                if (self.status == JobStatus.RUNNING and
+                        time.time() - (self.start_time or 0) < self._min_job_age):
+                    return self.status
+
                 # 检查作业是否成功完成
-                sacct_cmd = f"sacct -j {self.slurm_id} -o State -n"
+                sacct_cmd = [_slurm_bin("sacct"), "-j", self.slurm_id, "-o", "State", "-n"]
                 sacct_result = subprocess.run(
                     sacct_cmd,
-                    shell=True,
                     capture_output=True,
                     text=True
                 )
                 
-                state = sacct_result.stdout.strip().split()[0]
-                if state == "COMPLETED":
-                    self.status = JobStatus.COMPLETED
-                    if not self.end_time:
-                        self.end_time = time.time()
-                elif state in ["FAILED", "TIMEOUT", "OUT_OF_MEMORY"]:
-                    self.status = JobStatus.FAILED
-                    if not self.end_time:
-                        self.end_time = time.time()
-                
+                # 同一张状态映射表处理sacct的长状态（O(1)查找，
+                # 新增状态只需在_STATE_MAP加一行）
+                output = sacct_result.stdout.strip()
+                if output:
+                    # partition只取首个词（如"CANCELLED by ..."），
+                    # 不像split那样物化整个词列表
+                    self.apply_slurm_state(output.partition(' ')[0])
+
         except subprocess.CalledProcessError as e:
             print(f"检查作业状态失败: {e}")
             
@@ -266,8 +407,7 @@ class Job:
             return True
 
         try:
-            cmd = f"scancel {self.slurm_id}"
-            subprocess.run(cmd, shell=True, check=True)
+            subprocess.run([_slurm_bin("scancel"), self.slurm_id], check=True)
             self.status = JobStatus.CANCELLED
             self.end_time = time.time()
             return True
@@ -1,20 +1,42 @@
 from typing import List, Dict, Any, Optional, TextIO, Tuple
-from collections import deque
+from collections import OrderedDict
+import heapq
+import json
 import time
+import subprocess
 import sys
 import os
 import signal
+import threading
 from datetime import datetime, timedelta
-import pytz
-from .job import Job, JobStatus
+from zoneinfo import ZoneInfo
+from .job import Job, JobStatus, _slurm_bin, _STATE_MAP
 from .cluster_info import ClusterInfo
 
+# 热路径上比较用的终态别名：枚举成员是单例，用is做指针比较
+# 即可，绕开枚举__eq__的方法分派
+_ST_DONE = JobStatus.COMPLETED
+_ST_FAIL = JobStatus.FAILED
+_ST_CANCELLED = JobStatus.CANCELLED
+
+# 视为终态的Slurm状态码（完成/失败/取消），sidecar看到即唤醒主循环
+_TERMINAL_STATES = frozenset(
+    code for code, status in _STATE_MAP.items()
+    if status is not JobStatus.RUNNING
+)
+
+# 两次批量轮询之间的最小间隔（秒），防止外部调用方高频触发RPC
+_POLL_FLOOR = 15.0
+# 刚提交的任务给Slurm留出的入队宽限期（秒），期间不在squeue中
+# 不视为已结束，也不为其发起sacct查询
+_SACCT_GRACE = 30.0
+
+# 时区对象构建需要读取tz数据库，模块加载时做一次
+_SWISS_TZ = ZoneInfo('Europe/Zurich')
+
 def get_swiss_time() -> str:
     """获取瑞士时间"""
-    swiss_tz = pytz.timezone('Europe/Zurich')
-    utc_time = datetime.now(pytz.UTC)
-    swiss_time = utc_time.astimezone(swiss_tz)
-    return swiss_time.strftime("%Y-%m-%d %H:%M:%S %Z")
+    return datetime.now(_SWISS_TZ).strftime("%Y-%m-%d %H:%M:%S %Z")
 
 class JobManager:
     def __init__(
@@ -25,11 +47,14 @@ class JobManager:
         print_interval: float = 300.0,  # 默认每5分钟打印一次状态
         verbose: bool = True,
         log_file: Optional[str] = None,
-        daemon: bool = False
+        daemon: bool = False,
+        use_wait: bool = False,
+        use_squeue_sidecar: bool = False,
+        min_job_age: float = 300.0
     ):
         """
         初始化任务管理器
-        
+
         Args:
             max_concurrent_jobs: 最大并发任务数
             check_interval: 检查任务状态的时间间隔（秒）
@@ -38,6 +63,12 @@ class JobManager:
             verbose: 是否打印详细信息
             log_file: 日志文件路径，如果指定则将输出写入文件
             daemon: 是否以守护进程方式运行（后台运行）
+            use_wait: 使用sbatch --wait阻塞等待任务完成，代替squeue轮询
+                      （需要较新的Slurm版本，不可用时保持默认的轮询模式）
+            use_squeue_sidecar: 启动一个长驻的squeue -i子进程持续推送状态，
+                                轮询时直接读内存缓存，不再反复新建查询
+            min_job_age: 集群MinJobAge配置值（秒），已结束作业在此窗口内
+                         仍可由squeue查到，不必访问更慢的sacct/slurmdbd
         """
         self.max_concurrent_jobs = max_concurrent_jobs
         self.check_interval = check_interval
@@ -45,6 +76,9 @@ class JobManager:
         self.print_interval = print_interval
         self.verbose = verbose
         self.daemon = daemon
+        self.use_wait = use_wait
+        self.use_squeue_sidecar = use_squeue_sidecar
+        self.min_job_age = min_job_age
         self.last_print_time = 0
         
         # 设置日志输出
@@ -53,14 +87,41 @@ class JobManager:
             log_dir = os.path.dirname(log_file)
             if log_dir:
                 os.makedirs(log_dir, exist_ok=True)
-            self.log_file = open(log_file, 'a')
+            # 行缓冲：换行即由IO层落盘，不再每条日志显式flush
+            self.log_file = open(log_file, 'a', buffering=1)
         
         self.active_jobs: Dict[str, Job] = {}  # 正在运行的任务
-        self.pending_jobs: deque[Job] = deque()  # 等待执行的任务
-        self.completed_jobs: Dict[str, Job] = {}  # 已完成的任务
-        self.failed_jobs: Dict[str, Job] = {}  # 失败的任务
+        # 等待执行的任务：按(优先级, 序号)排序的最小堆，
+        # 重试任务优先级为0先出队，新任务为1按添加顺序出队
+        self._pending_heap: List[Tuple[int, int, Job]] = []
+        self._pending_seq = 0  # 单调递增序号，保证同优先级FIFO
+        self._pending_ids: set = set()  # 等待中任务ID，供O(1)查重
+        # 已完成/失败的任务：FIFO有界，超出上限的最老条目归档到日志，
+        # 保证长期运行时内存和每次状态遍历的开销都是常数
+        self.completed_jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.failed_jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._history_cap = max(10 * max_concurrent_jobs, 256)
         
         self.retry_counts: Dict[str, int] = {}  # 任务重试次数记录
+        self._status_cache: Dict[str, Dict[str, Any]] = {}  # 终态任务的状态渲染缓存
+        self._wait_threads: Dict[str, threading.Thread] = {}  # sbatch --wait工作线程
+        self._only_job_state: Optional[bool] = None  # squeue是否支持--only-job-state
+
+        # squeue -i sidecar：长驻子进程 + 读取线程 + 状态缓存
+        self._sidecar: Optional[subprocess.Popen] = None
+        self._sidecar_thread: Optional[threading.Thread] = None
+        self._state_cache: Dict[str, str] = {}
+        self._state_cache_lock = threading.Lock()
+        self._sidecar_fp: Optional[int] = None  # sidecar跟踪的作业集合指纹
+        self._last_poll_ts = 0.0  # 上次批量轮询的时间戳
+        # 主循环的唤醒事件：观察到任务到达终态时立即置位，
+        # 使下一个任务的提交不必等满整个check_interval
+        self._wake = threading.Event()
+        # 任务集合状态版本号，任何增删/状态迁移都会递增；
+        # 展示端据此判断是否需要重新拉取和推送
+        self._state_version = 0
+        # 待处理的信号编号：处理器只记录，收尾工作由主循环同步执行
+        self._pending_signal: Optional[int] = None
         
         # 初始化集群信息管理器
         self.cluster_info = ClusterInfo()
@@ -81,10 +142,11 @@ class JobManager:
             args: 脚本的参数字典
             **kwargs: 传递给Job构造函数的其他参数
         """
-        if job_id in self.active_jobs or job_id in self.completed_jobs:
+        if (job_id in self.active_jobs or job_id in self.completed_jobs
+                or job_id in self._pending_ids):
             print(f"任务 {job_id} 已存在")
             return False
-            
+
         job = Job(job_id, script_path, args, **kwargs)
         
         # 检查资源是否可用
@@ -102,29 +164,153 @@ class JobManager:
         if len(self.active_jobs) < self.max_concurrent_jobs:
             return self._submit_job(job)
         else:
-            self.pending_jobs.append(job)
+            self._enqueue_pending(job)
             self._log(f"任务 {job_id} 已添加到等待队列")
             return True
 
+    def _enqueue_pending(self, job: Job, retry: bool = False):
+        """将任务加入等待堆，重试任务优先于新任务出队"""
+        heapq.heappush(self._pending_heap,
+                       (0 if retry else 1, self._pending_seq, job))
+        self._pending_seq += 1
+        self._pending_ids.add(job.job_id)
+        self._state_version += 1
+
+    def add_job_array(
+        self,
+        job_id: str,
+        script_path: str,
+        arg_list: List[Dict[str, Any]],
+        **kwargs
+    ) -> bool:
+        """
+        以Slurm作业数组一次性提交一批同构任务
+
+        所有任务共享分区/GPU/内存等配置，仅脚本参数不同；一次sbatch
+        即提交全部任务，并发由--array的%限制控制。适用于默认执行器
+        （executor script.py -- --k=v形式）的任务。
+
+        Args:
+            job_id: 数组标识前缀，各任务记为 job_id_<索引>
+            script_path: 要执行的脚本路径
+            arg_list: 每个任务的参数字典列表
+            **kwargs: 传递给Job构造函数的其他参数
+        """
+        if not arg_list:
+            print("作业数组参数列表为空")
+            return False
+        if f"{job_id}_0" in self.active_jobs or f"{job_id}_0" in self.completed_jobs:
+            print(f"任务 {job_id}_0 已存在")
+            return False
+
+        template = Job(job_id, script_path, None, **kwargs)
+
+        # 资源检查只做一次（所有任务同构）
+        available, reason = self.cluster_info.check_resource_availability(
+            partition=template.partition,
+            cpus=template.num_cpus,
+            gpus=template.num_gpus,
+            memory=template.memory
+        )
+        if not available:
+            self._log(f"作业数组 {job_id} 资源检查失败: {reason}")
+            return False
+
+        # 参数文件：每行一个任务的参数串，计算节点按任务索引读取
+        os.makedirs("tmp", exist_ok=True)
+        args_file = os.path.abspath(f"tmp/slurm_array_{job_id}.args")
+        with open(args_file, "w") as f:
+            for args in arg_list:
+                f.write(" ".join(f"--{k}={v}" for k, v in (args or {}).items()) + "\n")
+
+        array_spec = f"0-{len(arg_list) - 1}%{self.max_concurrent_jobs}"
+        script_content = template._create_job_script_content(
+            array=array_spec, args_file=args_file)
+
+        try:
+            result = subprocess.run(
+                template._build_sbatch_command(),
+                input=script_content,
+                check=True,
+                capture_output=True,
+                text=True
+            )
+        except (subprocess.CalledProcessError, OSError) as e:
+            self._log(f"提交作业数组 {job_id} 失败: {e}")
+            return False
+
+        array_id = result.stdout.strip().split(';')[0]
+        now = time.time()
+        for i, args in enumerate(arg_list):
+            job = Job(f"{job_id}_{i}", script_path, args, **kwargs)
+            job.slurm_id = f"{array_id}_{i}"
+            job.status = JobStatus.RUNNING
+            job.start_time = now
+            self.active_jobs[job.job_id] = job
+        self._state_version += 1
+
+        self._log(f"作业数组 {job_id} 已提交到Slurm (ID: {array_id}, 共 {len(arg_list)} 个任务)")
+        return True
+
     def _submit_job(self, job: Job) -> bool:
         """
         提交任务到Slurm
         """
+        job._min_job_age = self.min_job_age
+        self._state_version += 1
+        if self.use_wait:
+            # sbatch --wait模式：每个并发槽位一个工作线程，阻塞等待完成
+            thread = threading.Thread(target=self._wait_worker, args=(job,))
+            thread.daemon = True
+            self.active_jobs[job.job_id] = job
+            self._wait_threads[job.job_id] = thread
+            thread.start()
+            print(f"任务 {job.job_id} 已提交到Slurm (等待模式)")
+            return True
+
         if job.submit():
             self.active_jobs[job.job_id] = job
             print(f"任务 {job.job_id} 已提交到Slurm (ID: {job.slurm_id})")
             return True
         return False
 
+    def _archive_job(self, job: Job):
+        """将被淘汰的历史任务写成一行JSON记录（仅在指定日志文件时）"""
+        if not self.log_file:
+            return
+        runtime = job.get_runtime()
+        record = {
+            "job_id": job.job_id,
+            "slurm_id": job.slurm_id,
+            "status": job.status.value,
+            "runtime": round(runtime, 2) if runtime else None,
+        }
+        self.log_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _evict_history(self, jobs: "OrderedDict[str, Job]"):
+        """历史表超过上限时按FIFO淘汰最老条目并归档"""
+        while len(jobs) > self._history_cap:
+            old_id, old_job = jobs.popitem(last=False)
+            self._status_cache.pop(old_id, None)
+            self._archive_job(old_job)
+
+    def _wait_worker(self, job: Job):
+        """sbatch --wait工作线程：等待任务结束后立即唤醒主循环"""
+        job.submit_and_wait()
+        self._wake.set()
+
     def _handle_completed_job(self, job: Job):
         """
         处理已完成的任务
         """
         job_id = job.job_id
         self.completed_jobs[job_id] = job
-        del self.active_jobs[job_id]
-        if job_id in self.retry_counts:
-            del self.retry_counts[job_id]
+        self.active_jobs.pop(job_id, None)
+        self.retry_counts.pop(job_id, None)
+        # 任务已到终态，状态渲染结果不会再变，冻结一次供后续查询复用
+        self._status_cache[job_id] = self._render_job_status(job)
+        self._state_version += 1
+        self._evict_history(self.completed_jobs)
         print(f"任务 {job_id} 已完成，运行时间: {job.get_runtime():.2f}秒")
 
     def _handle_failed_job(self, job: Job):
@@ -137,47 +323,278 @@ class JobManager:
         if retry_count < self.max_retries:
             self.retry_counts[job_id] = retry_count + 1
             print(f"任务 {job_id} 失败，正在重试 ({retry_count + 1}/{self.max_retries})")
-            self.pending_jobs.appendleft(job)  # 优先重试失败的任务
+            self._enqueue_pending(job, retry=True)  # 优先重试失败的任务
         else:
             print(f"任务 {job_id} 失败且超过最大重试次数")
             self.failed_jobs[job_id] = job
-            if job_id in self.retry_counts:
-                del self.retry_counts[job_id]
-        
-        del self.active_jobs[job_id]
+            self.retry_counts.pop(job_id, None)
+            # 终态任务的状态渲染结果冻结复用
+            self._status_cache[job_id] = self._render_job_status(job)
+            self._evict_history(self.failed_jobs)
+
+        self.active_jobs.pop(job_id, None)
+        self._state_version += 1
+
+    def _handle_cancelled_job(self, job: Job):
+        """
+        处理被外部取消的任务（例如手动scancel）
+
+        不走重试，直接归入失败表并从活动集合移除，否则该任务会
+        永远留在active_jobs里，主循环无法退出。
+        """
+        job_id = job.job_id
+        print(f"任务 {job_id} 已被取消")
+        self.failed_jobs[job_id] = job
+        self.retry_counts.pop(job_id, None)
+        # 终态任务的状态渲染结果冻结复用
+        self._status_cache[job_id] = self._render_job_status(job)
+        self._evict_history(self.failed_jobs)
+        self.active_jobs.pop(job_id, None)
+        self._state_version += 1
+
+    def _detect_only_job_state(self) -> bool:
+        """检测squeue是否支持--only-job-state（Slurm>=24）
+
+        该选项让控制器从作业状态缓存直接应答，避免轮询时反复
+        抢占调度器锁。结果只检测一次并缓存。
+        """
+        if self._only_job_state is None:
+            try:
+                result = subprocess.run([_slurm_bin("squeue"), "--help"], capture_output=True)
+                self._only_job_state = b"--only-job-state" in result.stdout
+            except (subprocess.SubprocessError, OSError):
+                self._only_job_state = False
+        return self._only_job_state
+
+    def _start_squeue_sidecar(self, slurm_ids: Optional[List[str]] = None):
+        """启动长驻的squeue -i子进程，持续把状态推进内存缓存
+
+        一条持久RPC通道代替每个周期重新建立的查询，控制器每个
+        周期只扫描一次作业表。
+
+        Args:
+            slurm_ids: 限定跟踪的作业ID列表，不指定时跟踪当前用户全部作业
+        """
+        try:
+            scope = ["-j", ",".join(slurm_ids)] if slurm_ids else ["--me"]
+            cmd = [
+                _slurm_bin("squeue"), *scope,
+                "-i", str(max(1, int(self.check_interval))),
+                "--noheader", "--format=%i|%t", "--states=all"
+            ]
+            self._sidecar = subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, text=True)
+        except (subprocess.SubprocessError, OSError) as e:
+            self._log(f"启动squeue sidecar失败，回退到轮询模式: {e}")
+            self._sidecar = None
+            return
+        self._sidecar_thread = threading.Thread(target=self._sidecar_loop)
+        self._sidecar_thread.daemon = True
+        self._sidecar_thread.start()
+
+    def _sidecar_loop(self):
+        """读取sidecar输出；每轮输出结束（分隔行）时原子换入新缓存"""
+        new_cache: Dict[str, str] = {}
+        saw_data = False
+        for raw_line in self._sidecar.stdout:
+            line = raw_line.strip()
+            if line and '|' in line:
+                slurm_id, state = line.split('|', 1)
+                new_cache[slurm_id] = state
+                saw_data = True
+                continue
+            # 空行/时间戳行视为一轮输出的分隔
+            if saw_data:
+                with self._state_cache_lock:
+                    self._state_cache = new_cache
+                # 出现终态立即唤醒主循环，等待队列的下一个任务
+                # 不必睡满整个check_interval
+                if not _TERMINAL_STATES.isdisjoint(new_cache.values()):
+                    self._wake.set()
+                new_cache = {}
+                saw_data = False
+        if saw_data:
+            with self._state_cache_lock:
+                self._state_cache = new_cache
+            if not _TERMINAL_STATES.isdisjoint(new_cache.values()):
+                self._wake.set()
+
+    def _sync_sidecar(self):
+        """使sidecar跟踪的作业集合与当前活动作业保持一致
+
+        集合指纹变化时才重启sidecar（一次fork换来后续周期的零开销，
+        集合不变时持久通道一直复用）；子进程意外退出时清理句柄，
+        poll_all会自动回退到一次性查询。
+        """
+        if not self.use_squeue_sidecar:
+            return
+        if self._sidecar is not None and self._sidecar.poll() is not None:
+            self._log("squeue sidecar已退出，回退到轮询模式")
+            self._sidecar = None
+
+        slurm_ids = sorted(
+            job.slurm_id for job in self.active_jobs.values() if job.slurm_id)
+        if not slurm_ids:
+            return
+        fp = hash(tuple(slurm_ids))
+        if fp != self._sidecar_fp:
+            self._stop_squeue_sidecar()
+            self._start_squeue_sidecar(slurm_ids)
+            self._sidecar_fp = fp
+
+    def _stop_squeue_sidecar(self):
+        """终止sidecar子进程"""
+        if self._sidecar is not None:
+            self._sidecar.terminate()
+            self._sidecar = None
+
+    def poll_all(self):
+        """
+        用一次squeue加一次sacct批量刷新所有活动任务的状态，
+        避免每个任务单独fork/exec一对查询命令
+        """
+        # 轮询下限：check_interval很短或外部高频调用时也不低于
+        # _POLL_FLOOR（亚秒级轮询对slurmctld有害；sidecar读缓存无此限制）
+        now = time.time()
+        if (self._sidecar is None and
+                now - self._last_poll_ts < max(self.check_interval, _POLL_FLOOR)):
+            return
+        self._last_poll_ts = now
+
+        slurm_ids = [job.slurm_id for job in self.active_jobs.values() if job.slurm_id]
+        if not slurm_ids:
+            return
+
+        states: Dict[str, str] = {}
+        if self._sidecar is not None:
+            # sidecar模式：直接读内存缓存，无需任何子进程
+            with self._state_cache_lock:
+                cache = self._state_cache
+            states = {sid: cache[sid] for sid in slurm_ids if sid in cache}
+        else:
+            try:
+                # --states=all让MinJobAge窗口内的终态（CD/F/CA等）直接
+                # 出现在squeue结果里，由控制器应答，不必落到sacct
+                cmd = [_slurm_bin("squeue"), "-h", "-j", ",".join(slurm_ids),
+                       "-o", "%i|%t", "--states=all"]
+                if self._detect_only_job_state():
+                    cmd.insert(1, "--only-job-state")
+                result = subprocess.run(cmd, capture_output=True, text=True)
+                if result.returncode == 0:
+                    for line in result.stdout.strip().split('\n'):
+                        if line and '|' in line:
+                            slurm_id, state = line.split('|', 1)
+                            states[slurm_id] = state
+            except (subprocess.SubprocessError, OSError) as e:
+                print(f"检查作业状态失败: {e}")
+                return
+
+        # 已不在队列中的任务用一次sacct查询最终状态；刚提交的任务
+        # 可能尚未进入squeue视图，宽限期内跳过，等下个周期再查
+        age_of = {
+            job.slurm_id: now - (job.start_time or now)
+            for job in self.active_jobs.values() if job.slurm_id
+        }
+        finished = [sid for sid in slurm_ids
+                    if sid not in states and age_of[sid] >= _SACCT_GRACE]
+        if finished:
+            try:
+                result = subprocess.run(
+                    [_slurm_bin("sacct"), "-j", ",".join(finished), "-o", "JobID,State", "-n", "-P"],
+                    capture_output=True, text=True
+                )
+                if result.returncode == 0:
+                    for line in result.stdout.strip().split('\n'):
+                        if line and '|' in line:
+                            slurm_id, state = line.split('|')[:2]
+                            if '.' not in slurm_id:  # 跳过.batch/.extern子记录
+                                states.setdefault(slurm_id, state.partition(' ')[0])
+            except (subprocess.SubprocessError, OSError) as e:
+                print(f"检查作业状态失败: {e}")
+
+        for job in self.active_jobs.values():
+            if job.slurm_id:
+                job.apply_slurm_state(states.get(job.slurm_id))
 
     def update_status(self):
         """
         更新所有活动任务的状态，并管理任务队列
         """
-        current_time = time.time()
-        
-        # 检查活动任务的状态
-        for job in list(self.active_jobs.values()):
-            status = job.check_status()
-            
-            if status == JobStatus.COMPLETED:
-                self._handle_completed_job(job)
-            elif status == JobStatus.FAILED:
-                self._handle_failed_job(job)
+        # 先只读遍历收集状态迁移，结束后统一处理；不再为了规避
+        # "遍历中修改"而在每个周期复制整份活动任务列表
+        to_complete: List[Job] = []
+        to_fail: List[Job] = []
+        to_cancel: List[Job] = []
+        # 局部别名：循环内LOAD_FAST代替LOAD_GLOBAL
+        st_done, st_fail, st_cancelled = _ST_DONE, _ST_FAIL, _ST_CANCELLED
+
+        if self.use_wait:
+            # 等待模式：工作线程退出即任务结束，无需轮询squeue
+            finished_ids = [job_id for job_id, thread in self._wait_threads.items()
+                            if not thread.is_alive()]
+            for job_id in finished_ids:
+                del self._wait_threads[job_id]
+                job = self.active_jobs[job_id]
+                if job.status is st_done:
+                    to_complete.append(job)
+                else:
+                    to_fail.append(job)
+        else:
+            # 批量刷新后按新状态分发，不再逐任务调用check_status
+            self._sync_sidecar()
+            self.poll_all()
+            for job in self.active_jobs.values():
+                status = job.status
+                if status is st_done:
+                    to_complete.append(job)
+                elif status is st_fail:
+                    to_fail.append(job)
+                elif status is st_cancelled:
+                    # 外部scancel等途径取消的任务同样要离开活动集合
+                    to_cancel.append(job)
+
+        for job in to_complete:
+            self._handle_completed_job(job)
+        for job in to_fail:
+            self._handle_failed_job(job)
+        for job in to_cancel:
+            self._handle_cancelled_job(job)
         
 
         
         # 提交等待队列中的任务
-        while len(self.active_jobs) < self.max_concurrent_jobs and self.pending_jobs:
-            next_job = self.pending_jobs.popleft()
+        while len(self.active_jobs) < self.max_concurrent_jobs and self._pending_heap:
+            _, _, next_job = heapq.heappop(self._pending_heap)
+            self._pending_ids.discard(next_job.job_id)
             if not self._submit_job(next_job):
                 self.failed_jobs[next_job.job_id] = next_job
         
-        # 定期打印状态信息
-        if self.verbose and (current_time - self.last_print_time >= self.print_interval):
-            self._print_status()
-            self.last_print_time = current_time
+        # 定期打印状态信息（时间只在verbose时读取，用monotonic做
+        # 间隔判断，不受系统时钟调整影响）
+        if self.verbose:
+            current_time = time.monotonic()
+            if current_time - self.last_print_time >= self.print_interval:
+                self._print_status()
+                self.last_print_time = current_time
 
 
 
     def _signal_handler(self, signum, frame):
-        """处理信号"""
+        """信号处理器：只记录信号并唤醒主循环
+
+        异步信号上下文里不做日志/子进程/加锁等非信号安全的操作，
+        繁重的收尾工作由主循环在_handle_pending_signal中同步执行。
+        """
+        self._pending_signal = signum
+        self._wake.set()
+
+    def _handle_pending_signal(self):
+        """在主循环上下文中处理挂起的信号（取消任务并退出）"""
+        signum = self._pending_signal
+        if signum is None:
+            return
+        self._pending_signal = None
+
         signal_names = {
             signal.SIGTERM: "SIGTERM",
             signal.SIGINT: "SIGINT (Ctrl+C)",
@@ -224,6 +641,10 @@ class JobManager:
                 self._log(f"Web监控: http://{web_host}:{web_port}")
             self._log("="*50 + "\n")
             
+            # 启动squeue sidecar（如果启用）
+            if self.use_squeue_sidecar:
+                self._start_squeue_sidecar()
+
             # 启动Web监控（如果启用）
             if web_monitor:
                 from . import web_monitor as wm
@@ -235,9 +656,14 @@ class JobManager:
                 web_thread.daemon = True
                 web_thread.start()
             
-            while self.active_jobs or self.pending_jobs:
+            while self.active_jobs or self._pending_heap:
                 self.update_status()
-                time.sleep(self.check_interval)
+                # 可被唤醒的睡眠：终态事件到来时立即进入下一轮，
+                # 否则最多等待check_interval（Ctrl+C仍可中断）
+                self._wake.wait(timeout=self.check_interval)
+                self._wake.clear()
+                # 信号处理器只置位，真正的收尾在这里同步执行
+                self._handle_pending_signal()
                 
         except Exception as e:
             self._log(f"\n发生错误: {type(e).__name__}: {str(e)}")
@@ -246,17 +672,51 @@ class JobManager:
             raise  # 重新抛出异常以便查看完整的错误信息
             
         finally:
+            self._stop_squeue_sidecar()
             if self.log_file:
                 self._log(f"\n=== 任务管理器关闭 ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')}) ===\n")
                 self.log_file.close()
 
     def cancel_all_jobs(self):
         """
-        取消所有活动任务
+        取消所有活动任务（用一次scancel批量取消，避免逐任务fork/exec）
         """
+        self._stop_squeue_sidecar()
+        slurm_ids = [job.slurm_id for job in self.active_jobs.values() if job.slurm_id]
+        if slurm_ids:
+            subprocess.run([_slurm_bin("scancel"), *slurm_ids], check=False)
+
+        now = time.time()
         for job in self.active_jobs.values():
-            job.cancel()
-        self.pending_jobs.clear()
+            if job.slurm_id:
+                # 已批量取消，仅更新内存中的状态
+                job.status = JobStatus.CANCELLED
+                if not job.end_time:
+                    job.end_time = now
+            else:
+                # 没有slurm id时回退到逐个取消
+                job.cancel()
+        self._pending_heap.clear()
+        self._pending_ids.clear()
+        self._state_version += 1
+
+    def resize_pool(self, new_size: int):
+        """运行时调整最大并发任务数
+
+        直接修改上限并唤醒主循环：扩大时等待队列的任务在下一轮
+        立即提交；缩小时不打断已在运行的任务，靠自然完成收敛到
+        新的上限。进程内单次赋值即原子，无需文件或信号中转。
+
+        Args:
+            new_size: 新的最大并发任务数（至少为1）
+        """
+        if new_size < 1:
+            print(f"无效的任务池大小: {new_size}")
+            return
+        self.max_concurrent_jobs = new_size
+        self._state_version += 1
+        self._wake.set()
+        self._log(f"任务池大小已调整为 {new_size}")
 
     def get_job_status(self, job_id: str) -> Optional[JobStatus]:
         """
@@ -270,68 +730,87 @@ class JobManager:
             return self.failed_jobs[job_id].status
         return None
 
-    def get_all_jobs_status(self) -> Dict[str, Dict[str, Any]]:
-        """
-        获取所有任务的状态信息
+    def _render_job_status(self, job: Job) -> Dict[str, Any]:
+        """渲染单个任务的状态信息字典"""
+        runtime = job.get_runtime()
+        runtime_str = str(timedelta(seconds=int(runtime))) if runtime else "N/A"
+
+        # 获取分区资源信息
+        partition_info = self.cluster_info.get_partition_info(job.partition)
+
+        return {
+            "status": job.status.value,
+            "slurm_id": job.slurm_id,
+            "runtime": runtime_str,
+            # 原始秒数给web端，格式化交给浏览器，传输也更紧凑
+            "runtime_seconds": int(runtime) if runtime else None,
+            "retry_count": self.retry_counts.get(job.job_id, 0),
+            "partition": job.partition,
+            "num_gpus": job.num_gpus,
+            "memory": job.memory,
+            # 资源描述串预先拼好，展示端（web监控等）不再逐帧format
+            "resources": f"{job.partition}, {job.num_gpus}GPU, {job.memory}内存",
+            "partition_info": partition_info if partition_info else {}
+        }
+
+    def iter_all_jobs_status(self):
+        """逐个产出 (job_id, 状态信息) 元组，不物化完整字典
+
+        活动任务每次重新渲染（运行时间在变化），终态任务直接复用
+        冻结的渲染结果，整体开销为O(活动数)而非O(历史总数)；
+        内部调用方（如_print_status）直接迭代，避免为上万个历史
+        任务构建一次性的临时大字典。
         """
-        status_info = {}
-        
-        # 获取集群资源信息
-        cluster_summary = self.cluster_info.get_resource_summary()
-        
-        for jobs in [self.active_jobs, self.completed_jobs, self.failed_jobs]:
+        for job_id, job in self.active_jobs.items():
+            yield job_id, self._render_job_status(job)
+
+        for jobs in [self.completed_jobs, self.failed_jobs]:
             for job_id, job in jobs.items():
-                runtime = job.get_runtime()
-                runtime_str = str(timedelta(seconds=int(runtime))) if runtime else "N/A"
-                
-                # 获取分区资源信息
-                partition_info = self.cluster_info.get_partition_info(job.partition)
-                
-                status_info[job_id] = {
-                    "status": job.status.value,
-                    "slurm_id": job.slurm_id,
-                    "runtime": runtime_str,
-                    "retry_count": self.retry_counts.get(job_id, 0),
-                    "partition": job.partition,
-                    "num_gpus": job.num_gpus,
-                    "memory": job.memory,
-                    "partition_info": partition_info if partition_info else {}
-                }
-        
-        for job in self.pending_jobs:
+                cached = self._status_cache.get(job_id)
+                if cached is None:
+                    cached = self._status_cache[job_id] = self._render_job_status(job)
+                yield job_id, cached
+
+        for _, _, job in self._pending_heap:
             partition_info = self.cluster_info.get_partition_info(job.partition)
-            status_info[job.job_id] = {
+            yield job.job_id, {
                 "status": "QUEUED",
                 "slurm_id": None,
                 "runtime": "N/A",
+                "runtime_seconds": None,
                 "retry_count": self.retry_counts.get(job.job_id, 0),
                 "partition": job.partition,
                 "num_gpus": job.num_gpus,
                 "memory": job.memory,
+                "resources": f"{job.partition}, {job.num_gpus}GPU, {job.memory}内存",
                 "partition_info": partition_info if partition_info else {}
             }
-        
+
+    def get_all_jobs_status(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取所有任务的状态信息（iter_all_jobs_status的物化包装，
+        保持原有的字典返回接口）
+        """
+        status_info = dict(self.iter_all_jobs_status())
+
         # 添加集群资源摘要
-        status_info["__cluster_summary__"] = cluster_summary
-            
+        status_info["__cluster_summary__"] = self.cluster_info.get_resource_summary()
+
         return status_info
         
     def _log(self, message: str):
         """输出日志信息"""
-        if self.log_file:
-            self.log_file.write(message + "\n")
-            self.log_file.flush()
+        f = self.log_file
+        if f:
+            # 两次write省去message+"\n"的拼接分配，行缓冲负责落盘
+            f.write(message)
+            f.write("\n")
         if self.verbose:
             print(message)
 
     def _print_status(self):
         """打印当前任务状态信息"""
-        self._log(f"\n=== 任务状态更新 ({get_swiss_time()}) ===")
-        
-        # 获取所有任务状态
-        all_status = self.get_all_jobs_status()
-        
-        # 按状态分类任务
+        # 按状态分类任务（直接迭代生成器，单趟分组，不构建中间字典）
         status_groups = {
             "RUNNING": [],
             "QUEUED": [],
@@ -339,47 +818,52 @@ class JobManager:
             "FAILED": [],
             "CANCELLED": []
         }
-        
-        for job_id, info in all_status.items():
-            status = info["status"]
-            status_groups.get(status, []).append((job_id, info))
-        
-        # 打印活动任务
+
+        for job_id, info in self.iter_all_jobs_status():
+            status_groups.get(info["status"], []).append((job_id, info))
+
+        # 整块输出先在内存中拼好，最后一次_log写出，
+        # 而不是几十次独立的write/print调用
+        lines = [f"\n=== 任务状态更新 ({get_swiss_time()}) ==="]
+
+        # 活动任务
         if status_groups["RUNNING"]:
-            self._log("\n活动任务:")
+            lines.append("\n活动任务:")
             for job_id, info in status_groups["RUNNING"]:
-                self._log(f"  - {job_id} (Slurm ID: {info['slurm_id']}):")
-                self._log(f"    状态: {info['status']}")
-                self._log(f"    运行时间: {info['runtime']}")
-                self._log(f"    资源: {info['partition']}, {info['num_gpus']}GPU, {info['memory']}内存")
+                lines.append(f"  - {job_id} (Slurm ID: {info['slurm_id']}):")
+                lines.append(f"    状态: {info['status']}")
+                lines.append(f"    运行时间: {info['runtime']}")
+                lines.append(f"    资源: {info['resources']}")
                 if info['retry_count'] > 0:
-                    self._log(f"    重试次数: {info['retry_count']}")
-        
-        # 打印等待任务
+                    lines.append(f"    重试次数: {info['retry_count']}")
+
+        # 等待任务
         if status_groups["QUEUED"]:
-            self._log("\n等待任务:")
+            lines.append("\n等待任务:")
             for job_id, info in status_groups["QUEUED"]:
-                self._log(f"  - {job_id} (将使用: {info['partition']}, {info['num_gpus']}GPU, {info['memory']}内存)")
-        
-        # 打印最近完成的任务
+                lines.append(f"  - {job_id} (将使用: {info['resources']})")
+
+        # 最近完成的任务
         if status_groups["COMPLETED"]:
-            self._log("\n已完成任务:")
+            lines.append("\n已完成任务:")
             for job_id, info in status_groups["COMPLETED"]:
-                self._log(f"  - {job_id}: 运行时间 {info['runtime']}")
-        
-        # 打印失败任务
+                lines.append(f"  - {job_id}: 运行时间 {info['runtime']}")
+
+        # 失败任务
         if status_groups["FAILED"] or status_groups["CANCELLED"]:
-            self._log("\n失败/取消的任务:")
+            lines.append("\n失败/取消的任务:")
             for status in ["FAILED", "CANCELLED"]:
                 for job_id, info in status_groups[status]:
-                    self._log(f"  - {job_id} ({status})")
+                    lines.append(f"  - {job_id} ({status})")
                     if info['retry_count'] > 0:
-                        self._log(f"    重试次数: {info['retry_count']}")
-        
-        self._log("\n任务统计:")
-        self._log(f"  运行中: {len(status_groups['RUNNING'])}")
-        self._log(f"  等待中: {len(status_groups['QUEUED'])}")
-        self._log(f"  已完成: {len(status_groups['COMPLETED'])}")
-        self._log(f"  已失败: {len(status_groups['FAILED'])}")
-        self._log(f"  已取消: {len(status_groups['CANCELLED'])}")
-        self._log("="*50)
+                        lines.append(f"    重试次数: {info['retry_count']}")
+
+        lines.append("\n任务统计:")
+        lines.append(f"  运行中: {len(status_groups['RUNNING'])}")
+        lines.append(f"  等待中: {len(status_groups['QUEUED'])}")
+        lines.append(f"  已完成: {len(status_groups['COMPLETED'])}")
+        lines.append(f"  已失败: {len(status_groups['FAILED'])}")
+        lines.append(f"  已取消: {len(status_groups['CANCELLED'])}")
+        lines.append("="*50)
+
+        self._log("\n".join(lines))
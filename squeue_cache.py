@@ -0,0 +1,63 @@
+import subprocess
+import time
+from typing import Dict, List, Optional, Tuple
+
+class SqueueCache:
+    """squeue查询结果的TTL缓存
+
+    多个调用方（cancel_jobs、JobManager等）共享同一次squeue查询结果，
+    避免在短时间内重复轰炸slurmctld。
+    """
+
+    def __init__(self, ttl: float = 10.0):
+        """
+        Args:
+            ttl: 缓存有效期（秒），在此期间内的重复查询直接复用上次结果
+        """
+        self.ttl = ttl
+        # user -> (查询时间, 作业列表)
+        self._cache: Dict[Optional[str], Tuple[float, List[Tuple[str, str, str, str]]]] = {}
+
+    def get(self, user: Optional[str] = None,
+            ttl: Optional[float] = None) -> List[Tuple[str, str, str, str]]:
+        """获取作业列表，返回 (slurm_id, name, status, partition) 元组列表
+
+        Args:
+            user: 限定查询的用户名（默认查询所有用户）
+            ttl: 本次查询允许的缓存有效期（默认使用实例的ttl）
+        """
+        if ttl is None:
+            ttl = self.ttl
+        now = time.monotonic()
+        cached = self._cache.get(user)
+        if cached and now - cached[0] < ttl:
+            return cached[1]
+
+        cmd = ["squeue", "-h", "-o", "%i|%j|%t|%P"]
+        if user:
+            cmd.extend(["-u", user])
+
+        # 逐行流式解析bytes输出：解析与子进程I/O重叠进行，
+        # 也避免把上万行队列一次性缓冲进内存
+        jobs = []
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE) as process:
+            for line in process.stdout:
+                line = line.strip()
+                if line:
+                    parts = line.split(b'|')
+                    if len(parts) == 4:
+                        jobs.append((parts[0].decode(), parts[1].decode(),
+                                     parts[2].decode(), parts[3].decode()))
+            returncode = process.wait()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd)
+
+        self._cache[user] = (now, jobs)
+        return jobs
+
+    def invalidate(self) -> None:
+        """清空缓存，在sbatch/scancel之后调用以强制下次查询刷新"""
+        self._cache.clear()
+
+# 模块级共享实例
+squeue_cache = SqueueCache()
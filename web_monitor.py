@@ -1,18 +1,43 @@
 from flask import Flask, render_template
 from flask_socketio import SocketIO, emit
 import json
-import threading
 import time
 from typing import Optional
 from datetime import datetime
-import pytz
+from zoneinfo import ZoneInfo
+
+# 时区对象在模块加载时构建一次，1Hz的状态线程不再逐帧解析tz数据库
+_SWISS_TZ = ZoneInfo('Europe/Zurich')
 
 app = Flask(__name__)
-socketio = SocketIO(app)
+# 内嵌运行（JobManager.run延迟导入本模块）必须用threading模式：
+# 此时主循环的Event、sidecar线程、信号处理器等原生对象已经创建，
+# 中途eventlet.monkey_patch会让server变成寄宿在主线程的greenlet，
+# 被主循环的原生Event.wait饿死。eventlet仅适合在独立入口进程里
+# 于一切导入之前打补丁后使用。
+socketio = SocketIO(app, async_mode='threading')
 
 # 全局变量存储JobManager实例
 job_manager = None
 
+# 最近一次构建的状态负载及对应的状态版本号：
+# 新连接和版本未变的场景直接复用，不重复构建
+_last_payload = None
+_last_payload_version = None
+
+def _current_payload(force: bool = False):
+    """返回当前状态负载，版本号未变时复用上次构建的结果
+
+    Args:
+        force: 强制重建（用于定时刷新运行时长等随时间变化的字段）
+    """
+    global _last_payload, _last_payload_version
+    version = job_manager._state_version
+    if force or _last_payload is None or _last_payload_version != version:
+        _last_payload = _get_status_data()
+        _last_payload_version = version
+    return _last_payload
+
 @app.route('/')
 def index():
     """渲染主页"""
@@ -22,75 +47,82 @@ def index():
 def handle_connect():
     """处理客户端连接"""
     if job_manager:
-        # 发送初始状态
-        emit('status_update', _get_status_data())
+        # 发送初始状态（复用已构建的负载，连接风暴不会反复重建）
+        emit('status_update', _current_payload())
+
+# 各状态的条目构建器：单次字典分派代替每个任务五次if/elif比较，
+# 资源描述串由JobManager在渲染状态时预先拼好（info["resources"]）
+_BUILDERS = {
+    "running": lambda job_id, info: {
+        "id": job_id,
+        "slurm_id": info["slurm_id"],
+        "runtime": info["runtime_seconds"],
+        "resources": info["resources"]
+    },
+    "queued": lambda job_id, info: {
+        "id": job_id,
+        "resources": info["resources"]
+    },
+    "completed": lambda job_id, info: {
+        "id": job_id,
+        "runtime": info["runtime_seconds"]
+    },
+    "failed": lambda job_id, info: {
+        "id": job_id,
+        "retry_count": info["retry_count"]
+    },
+    "cancelled": lambda job_id, info: {
+        "id": job_id
+    },
+}
 
 def _get_status_data():
     """获取任务状态数据"""
     if not job_manager:
         return {}
-    
-    status = job_manager.get_all_jobs_status()
-    
-    # 按状态分组
-    groups = {
-        "running": [],
-        "queued": [],
-        "completed": [],
-        "failed": [],
-        "cancelled": []
-    }
-    
-    for job_id, info in status.items():
+
+    # 按状态分组：直接迭代生成器单趟完成，不经过中间的大字典
+    groups = {status: [] for status in _BUILDERS}
+
+    for job_id, info in job_manager.iter_all_jobs_status():
         job_status = info["status"].lower()
-        if job_status == "running":
-            groups["running"].append({
-                "id": job_id,
-                "slurm_id": info["slurm_id"],
-                "runtime": info["runtime"],
-                "resources": f"{info['partition']}, {info['num_gpus']}GPU, {info['memory']}内存"
-            })
-        elif job_status == "queued":
-            groups["queued"].append({
-                "id": job_id,
-                "resources": f"{info['partition']}, {info['num_gpus']}GPU, {info['memory']}内存"
-            })
-        elif job_status == "completed":
-            groups["completed"].append({
-                "id": job_id,
-                "runtime": info["runtime"]
-            })
-        elif job_status == "failed":
-            groups["failed"].append({
-                "id": job_id,
-                "retry_count": info["retry_count"]
-            })
-        elif job_status == "cancelled":
-            groups["cancelled"].append({
-                "id": job_id
-            })
-    
+        builder = _BUILDERS.get(job_status)
+        if builder is not None:
+            groups[job_status].append(builder(job_id, info))
+
     # 添加统计信息
-    stats = {
-        "running": len(groups["running"]),
-        "queued": len(groups["queued"]),
-        "completed": len(groups["completed"]),
-        "failed": len(groups["failed"]),
-        "cancelled": len(groups["cancelled"])
-    }
+    stats = {status: len(jobs) for status, jobs in groups.items()}
     
     return {
         "groups": groups,
         "stats": stats,
-        "timestamp": datetime.now(pytz.timezone('Europe/Zurich')).strftime("%Y-%m-%d %H:%M:%S %Z")
+        "timestamp": datetime.now(_SWISS_TZ).strftime("%Y-%m-%d %H:%M:%S %Z")
     }
 
+# 状态没有变化时仍强制推送一次的最长间隔（秒），用于刷新运行时长显示
+_FORCED_EMIT_INTERVAL = 10.0
+
 def status_update_thread():
-    """定期发送状态更新"""
+    """定期发送状态更新
+
+    只在管理器的状态版本号变化时才重建并广播快照，空闲期间
+    不做任何JSON序列化和网络发送；为了让运行中任务的时长显示
+    保持前进，最长每_FORCED_EMIT_INTERVAL秒仍推送一次。
+    """
+    last_version = None
+    last_emit = 0.0
     while True:
         if job_manager:
-            socketio.emit('status_update', _get_status_data())
-        time.sleep(1)  # 每秒更新一次
+            version = job_manager._state_version
+            now = time.monotonic()
+            if (version != last_version or
+                    now - last_emit >= _FORCED_EMIT_INTERVAL):
+                # 定时刷新（版本未变）时强制重建以更新运行时长
+                socketio.emit('status_update',
+                              _current_payload(force=(version == last_version)))
+                last_version = version
+                last_emit = now
+        socketio.sleep(1)  # 每秒检查一次（协作式，不阻塞服务器）
 
 def run_monitor(manager, host: str = '127.0.0.1', port: int = 5000):
     """
@@ -104,10 +136,9 @@ def run_monitor(manager, host: str = '127.0.0.1', port: int = 5000):
     global job_manager
     job_manager = manager
     
-    # 启动状态更新线程
-    update_thread = threading.Thread(target=status_update_thread)
-    update_thread.daemon = True
-    update_thread.start()
-    
+    # 启动状态更新任务（由socketio按当前async_mode调度）
+    socketio.start_background_task(status_update_thread)
+
+
     # 启动Web服务器
     socketio.run(app, host=host, port=port)